@@ -0,0 +1,117 @@
+"""Benchmarks token counts and serialization speed of the DOM prompt formats in test.dom_utils."""
+
+import argparse
+import ast
+import json
+import timeit
+from typing import Any, Dict, List
+
+import tiktoken
+from tabulate import tabulate
+
+from test.dom_utils import DOM_SERIALIZERS, parse_dom_compact, serialize_dom_compact
+
+
+def load_dom(file_path: str) -> Dict[str, Any]:
+    """Load a DOM dump saved either as JSON or as the Python repr used in prompts.
+
+    Args:
+        file_path (str): Path to the DOM dump.
+
+    Returns:
+        Dict[str, Any]: The DOM dict.
+    """
+    with open(file_path, "r", encoding="utf-8") as f:  # noqa: UP015
+        content = f.read()
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError:
+        return ast.literal_eval(content)
+
+
+def synthetic_dom(num_elements: int = 500) -> Dict[str, Any]:
+    """Build a DOM shaped like get_dom_with_content_type output, for when no dump is given.
+
+    Args:
+        num_elements (int, optional): Number of leaf elements. Defaults to 500.
+
+    Returns:
+        Dict[str, Any]: The DOM dict.
+    """
+    sections: List[Dict[str, Any]] = []
+    for section_index in range(num_elements // 10):
+        children = [
+            {
+                "role": "link" if i % 3 else "button",
+                "name": f"Item {section_index}-{i} details",
+                "mmid": str(section_index * 10 + i),
+                "tag": "a" if i % 3 else "button",
+            }
+            for i in range(10)
+        ]
+        sections.append(
+            {
+                "role": "region",
+                "name": f"Section {section_index}",
+                "children": children,
+                "mmid": str(100000 + section_index),
+                "tag": "div",
+            }
+        )
+    sections.append(
+        {
+            "role": "combobox",
+            "name": "q",
+            "description": "Search",
+            "focused": True,
+            "mmid": "170",
+            "tag": "textarea",
+            "aria-label": "Search",
+        }
+    )
+    return {"role": "WebArea", "name": "Synthetic", "children": sections}
+
+
+def benchmark(dom: Dict[str, Any], repeat: int = 20) -> List[List[Any]]:
+    encoding = tiktoken.get_encoding("cl100k_base")
+    rows: List[List[Any]] = []
+    for dom_format, serializer in DOM_SERIALIZERS.items():
+        rendered = serializer(dom)
+        seconds = timeit.timeit(lambda: serializer(dom), number=repeat) / repeat
+        rows.append(
+            [
+                dom_format,
+                len(rendered),
+                len(encoding.encode(rendered)),
+                round(seconds * 1000, 3),
+            ]
+        )
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare DOM prompt formats.")
+    parser.add_argument(
+        "dom_files",
+        nargs="*",
+        help="DOM dumps (JSON or Python repr). A synthetic DOM is used if none are given.",
+    )
+    parser.add_argument(
+        "-r", "--repeat", type=int, default=20, help="Serializations timed per format."
+    )
+    args = parser.parse_args()
+
+    doms = {path: load_dom(path) for path in args.dom_files} or {
+        "synthetic": synthetic_dom()
+    }
+    for name, dom in doms.items():
+        assert parse_dom_compact(serialize_dom_compact(dom)) == dom
+        print(f"\n{name}")
+        print(
+            tabulate(
+                [["Format", "Characters", "Tokens", "Serialize (ms)"]]
+                + benchmark(dom, args.repeat),
+                headers="firstrow",
+                tablefmt="grid",
+            )
+        )
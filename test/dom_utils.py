@@ -0,0 +1,430 @@
+"""Implements helper functions to shrink accessibility tree DOM dumps before they are sent to an LLM."""
+
+import json
+import math
+import re
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Set, Union
+
+import tiktoken
+
+INTERACTIVE_ROLES = {
+    "button",
+    "checkbox",
+    "combobox",
+    "link",
+    "listbox",
+    "menuitem",
+    "option",
+    "radio",
+    "searchbox",
+    "slider",
+    "spinbutton",
+    "switch",
+    "tab",
+    "textbox",
+}
+INTERACTIVE_TAGS = {"a", "button", "input", "select", "textarea"}
+TEXT_FIELDS = ("name", "aria-label", "description", "title", "placeholder", "value")
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+_SAFE_KEY_PATTERN = re.compile(r"^[\w\-]+$")
+_SAFE_VALUE_PATTERN = re.compile(r"^[^\s\"][^\s]*$")
+_SAFE_ROLE_PATTERN = re.compile(r"^[^\s\"=:][^\s=:]*$")
+_JSON_DECODER = json.JSONDecoder()
+_INDENT = "  "
+
+
+def _tokenize(text: str) -> List[str]:
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+def _flatten_dom(dom: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Flatten a DOM tree into a List of entries holding each node and the index of its parent.
+
+    Non-dict children, such as text strings, get their own entries so they survive pruning.
+
+    Args:
+        dom (Dict[str, Any]): The root of the accessibility tree.
+
+    Returns:
+        List[Dict[str, Any]]: One entry per node in depth-first order.
+    """
+    entries: List[Dict[str, Any]] = []
+    stack: List[tuple] = [(dom, None)]
+    while stack:
+        node, parent = stack.pop()
+        index = len(entries)
+        entries.append({"node": node, "parent": parent})
+        if isinstance(node, dict) and isinstance(node.get("children"), list):
+            for child in reversed(node["children"]):
+                stack.append((child, index))
+    return entries
+
+
+def _own_fields(node: Any) -> Any:
+    if isinstance(node, dict):
+        return {k: v for k, v in node.items() if k != "children"}
+    return node
+
+
+def _node_text(node: Any) -> str:
+    if isinstance(node, dict):
+        return " ".join(str(node.get(field, "")) for field in TEXT_FIELDS)
+    return str(node)
+
+
+def _is_interactive(node: Any) -> bool:
+    if not isinstance(node, dict):
+        return False
+    return node.get("role") in INTERACTIVE_ROLES or node.get("tag") in INTERACTIVE_TAGS
+
+
+def bm25_scores(
+    query: str, documents: List[str], k1: float = 1.5, b: float = 0.75
+) -> List[float]:
+    """Score documents against a query with Okapi BM25.
+
+    Args:
+        query (str): The query text, e.g. the task objective.
+        documents (List[str]): The texts to score.
+        k1 (float, optional): Term frequency saturation. Defaults to 1.5.
+        b (float, optional): Document length normalisation. Defaults to 0.75.
+
+    Returns:
+        List[float]: The BM25 score of each document, in input order.
+    """
+    tokenized_docs = [_tokenize(doc) for doc in documents]
+    query_terms = set(_tokenize(query))
+    if not tokenized_docs or not query_terms:
+        return [0.0] * len(documents)
+
+    num_docs = len(tokenized_docs)
+    avg_len = sum(len(doc) for doc in tokenized_docs) / num_docs or 1.0
+    doc_freq: Counter = Counter()
+    for doc in tokenized_docs:
+        doc_freq.update(query_terms.intersection(doc))
+
+    scores: List[float] = []
+    for doc in tokenized_docs:
+        term_freq = Counter(doc)
+        score = 0.0
+        for term in query_terms:
+            if term not in term_freq:
+                continue
+            idf = math.log(
+                1 + (num_docs - doc_freq[term] + 0.5) / (doc_freq[term] + 0.5)
+            )
+            tf = term_freq[term]
+            score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(doc) / avg_len))
+        scores.append(score)
+    return scores
+
+
+def _rebuild_dom(entries: List[Dict[str, Any]], kept: Set[int]) -> Dict[str, Any]:
+    pruned_nodes: Dict[int, Any] = {}
+    for index in sorted(kept):
+        pruned_nodes[index] = _own_fields(entries[index]["node"])
+        parent = entries[index]["parent"]
+        if parent is not None:
+            pruned_nodes[parent].setdefault("children", []).append(pruned_nodes[index])
+    return pruned_nodes[0]
+
+
+def prune_dom(
+    dom: Union[Dict[str, Any], str],
+    objective: str,
+    token_budget: int,
+    encoding_name: str = "cl100k_base",
+    dom_format: str = "repr",
+) -> Union[Dict[str, Any], str]:
+    """Prune an accessibility tree to the elements most relevant to the objective, within a token budget.
+
+    Focused elements are always kept. The remaining elements are added in rank order, together with their
+    ancestors so the tree structure is preserved, until the budget is spent: actionable elements (interactive
+    roles and tags) first, then everything else, each group ordered by BM25 relevance of name, aria label and
+    description to the objective. Actionable elements are therefore only dropped when the budget cannot hold
+    all of them, and then the least relevant ones go first. The rendered result is measured and trimmed
+    until it fits.
+
+    Args:
+        dom (Union[Dict[str, Any], str]): The DOM as returned by get_dom_with_content_type. Non-dict values (e.g. error strings) are returned unchanged.
+        objective (str): The task objective used as the relevance query.
+        token_budget (int): The maximum number of tokens the pruned DOM may take when rendered with serialize_dom in dom_format. Only exceeded if the focused elements alone do not fit.
+        encoding_name (str, optional): The tiktoken encoding used to measure tokens. Defaults to "cl100k_base".
+        dom_format (str, optional): The format the pruned DOM will be rendered in, see serialize_dom. Defaults to "repr".
+
+    Returns:
+        Union[Dict[str, Any], str]: The pruned DOM, or the original DOM if it already fits the budget.
+
+    Raises:
+        ValueError: If the format is not supported.
+    """
+    if dom_format not in DOM_SERIALIZERS:
+        raise ValueError(f"Unknown DOM format: {dom_format}")
+    if not isinstance(dom, dict):
+        return dom
+    encoding = tiktoken.get_encoding(encoding_name)
+
+    def count(value: Any) -> int:
+        return len(encoding.encode(serialize_dom(value, dom_format)))
+
+    if count(dom) <= token_budget:
+        return dom
+
+    entries = _flatten_dom(dom)
+    relevance = bm25_scores(objective, [_node_text(entry["node"]) for entry in entries])
+    # separator between siblings, and the wrapper a parent gets with its first kept child
+    one_child = count({"children": [{}]})
+    separator_cost = count({"children": [{}, {}]}) - one_child - count({})
+    children_cost = max(one_child - 2 * count({}) - separator_cost, 0)
+    for entry, score in zip(entries, relevance):
+        node = entry["node"]
+        entry["cost"] = count(_own_fields(node)) + separator_cost
+        entry["score"] = score
+        entry["required"] = isinstance(node, dict) and bool(node.get("focused"))
+
+    ranked = sorted(
+        range(len(entries)),
+        key=lambda i: (
+            not entries[i]["required"],
+            not _is_interactive(entries[i]["node"]),
+            -entries[i]["score"],
+            i,
+        ),
+    )
+
+    kept: Set[int] = {0}
+    spent = entries[0]["cost"]
+    # each group is the element plus the ancestors it pulled in, in the order they were added
+    groups: List[tuple] = []
+    parents_with_children: Set[int] = set()
+    for index in ranked:
+        path: List[int] = []
+        current: Optional[int] = index
+        while current is not None and current not in kept:
+            path.append(current)
+            current = entries[current]["parent"]
+        if not path:
+            continue
+        cost = sum(entries[i]["cost"] for i in path)
+        if current is not None and current not in parents_with_children:
+            cost += children_cost
+        if spent + cost > token_budget and not entries[index]["required"]:
+            continue
+        kept.update(path)
+        parents_with_children.update(
+            entries[i]["parent"] for i in path if entries[i]["parent"] is not None
+        )
+        spent += cost
+        groups.append((path, cost, entries[index]["required"]))
+
+    pruned = _rebuild_dom(entries, kept)
+    excess = count(pruned) - token_budget
+    while excess > 0:
+        # drop the most recently added optional groups first, earlier groups never depend on later ones
+        removed = 0
+        while removed < excess:
+            optional = [g for g in groups if not g[2]]
+            if not optional:
+                break
+            path, cost, _ = optional[-1]
+            groups.remove(optional[-1])
+            kept.difference_update(path)
+            removed += cost
+        if not removed:
+            break
+        pruned = _rebuild_dom(entries, kept)
+        excess = count(pruned) - token_budget
+    return pruned
+
+
+def rank_mmids(dom: Union[Dict[str, Any], str], objective: str) -> List[str]:
+    """Rank the mmids of the elements by BM25 relevance of name, aria label and description to the objective.
+
+    Args:
+        dom (Union[Dict[str, Any], str]): The DOM as returned by get_dom_with_content_type or prune_dom.
+        objective (str): The task objective used as the relevance query.
+
+    Returns:
+        List[str]: The mmids of the elements that match the objective at all, most relevant first.
+    """
+    if not isinstance(dom, dict):
+        return []
+    entries = [
+        entry
+        for entry in _flatten_dom(dom)
+        if isinstance(entry["node"], dict) and "mmid" in entry["node"]
+    ]
+    relevance = bm25_scores(objective, [_node_text(entry["node"]) for entry in entries])
+    ranked = sorted(
+        (-score, index) for index, score in enumerate(relevance) if score > 0
+    )
+    return [str(entries[index]["node"]["mmid"]) for _, index in ranked]
+
+
+def _serialize_key(key: str) -> str:
+    return key if _SAFE_KEY_PATTERN.match(key) else json.dumps(key)
+
+
+def _serialize_attribute(key: str, value: Any) -> str:
+    if value is True and _SAFE_KEY_PATTERN.match(key):
+        return key
+    if isinstance(value, str):
+        if _SAFE_VALUE_PATTERN.match(value):
+            return f"{_serialize_key(key)}={value}"
+        return f"{_serialize_key(key)}={json.dumps(value)}"
+    return f"{_serialize_key(key)}:{json.dumps(value)}"
+
+
+def _serialize_node(node: Dict[str, Any], depth: int, lines: List[str]) -> None:
+    role = node.get("role")
+    if not isinstance(role, str):
+        parts = ["-"]
+    elif role != "-" and _SAFE_ROLE_PATTERN.match(role):
+        parts = [role]
+    else:
+        parts = [json.dumps(role)]
+    if isinstance(node.get("name"), str):
+        parts.append(json.dumps(node["name"]))
+
+    children = node.get("children")
+    for key, value in node.items():
+        if key in ("role", "name") and isinstance(value, str):
+            continue
+        if key == "children" and isinstance(children, list) and children:
+            continue
+        parts.append(_serialize_attribute(key, value))
+    lines.append(_INDENT * depth + " ".join(parts))
+
+    if isinstance(children, list):
+        for child in children:
+            if isinstance(child, dict):
+                _serialize_node(child, depth + 1, lines)
+            else:
+                lines.append(_INDENT * (depth + 1) + "= " + json.dumps(child))
+
+
+def serialize_dom_compact(dom: Union[Dict[str, Any], str]) -> str:
+    """Serialize an accessibility tree into a compact line oriented format.
+
+    Each element is written on its own line, indented by its depth, as its role (or "-"), its quoted name and
+    its remaining attributes. String attributes are written as key=value (quoted only when needed), True as a
+    bare key and any other value as key:<json>. The output can be parsed back with parse_dom_compact.
+
+    Args:
+        dom (Union[Dict[str, Any], str]): The DOM as returned by get_dom_with_content_type. Non-dict values are returned as str().
+
+    Returns:
+        str: The compact serialization.
+    """
+    if not isinstance(dom, dict):
+        return str(dom)
+    lines: List[str] = []
+    _serialize_node(dom, 0, lines)
+    return "\n".join(lines)
+
+
+def _parse_string_token(line: str, pos: int) -> tuple:
+    if line[pos] == '"':
+        return _JSON_DECODER.raw_decode(line, pos)
+    end = pos
+    while end < len(line) and not line[end].isspace() and line[end] not in "=:":
+        end += 1
+    return line[pos:end], end
+
+
+def _parse_line(line: str) -> Dict[str, Any]:
+    node: Dict[str, Any] = {}
+    role, pos = _parse_string_token(line, 0)
+    if line[0] == '"' or role != "-":
+        node["role"] = role
+    while pos < len(line):
+        if line[pos].isspace():
+            pos += 1
+            continue
+        quoted = line[pos] == '"'
+        token, pos = _parse_string_token(line, pos)
+        separator = line[pos] if pos < len(line) else ""
+        if separator == "=":
+            if pos + 1 < len(line) and line[pos + 1] == '"':
+                value, pos = _JSON_DECODER.raw_decode(line, pos + 1)
+            else:
+                end = pos + 1
+                while end < len(line) and not line[end].isspace():
+                    end += 1
+                value, pos = line[pos + 1 : end], end
+            node[token] = value
+        elif separator == ":":
+            node[token], pos = _JSON_DECODER.raw_decode(line, pos + 1)
+        elif quoted and "name" not in node:
+            node["name"] = token
+        else:
+            node[token] = True
+    return node
+
+
+def parse_dom_compact(text: str) -> Union[Dict[str, Any], str]:
+    """Parse the output of serialize_dom_compact back into the nested dict form.
+
+    Args:
+        text (str): The compact serialization.
+
+    Returns:
+        Union[Dict[str, Any], str]: The DOM dict, or the text unchanged if it cannot be parsed.
+    """
+    try:
+        root = _parse_lines(text.split("\n"))
+    except (ValueError, IndexError):
+        return text
+    return root if root is not None else text
+
+
+def _parse_lines(lines: List[str]) -> Optional[Dict[str, Any]]:
+    stack: List[Dict[str, Any]] = []
+    root: Optional[Dict[str, Any]] = None
+    for line in lines:
+        stripped = line.lstrip(" ")
+        depth = (len(line) - len(stripped)) // len(_INDENT)
+        if root is None:
+            if depth != 0 or not stripped:
+                return None
+            root = _parse_line(stripped)
+            stack = [root]
+            continue
+        if depth == 0:
+            # a second top level element, not a single tree
+            return None
+        del stack[depth:]
+        children = stack[-1].setdefault("children", [])
+        if stripped.startswith("= "):
+            children.append(json.loads(stripped[2:]))
+            continue
+        node = _parse_line(stripped)
+        children.append(node)
+        stack.append(node)
+    return root
+
+
+DOM_SERIALIZERS: Dict[str, Callable[[Union[Dict[str, Any], str]], str]] = {
+    "repr": str,
+    "compact": serialize_dom_compact,
+}
+
+
+def serialize_dom(dom: Union[Dict[str, Any], str], dom_format: str = "repr") -> str:
+    """Render a DOM for a prompt in the given format.
+
+    Args:
+        dom (Union[Dict[str, Any], str]): The DOM as returned by get_dom_with_content_type.
+        dom_format (str, optional): "repr" for the Python repr of the dict, "compact" for serialize_dom_compact. Defaults to "repr".
+
+    Returns:
+        str: The rendered DOM.
+
+    Raises:
+        ValueError: If the format is not supported.
+    """
+    if dom_format not in DOM_SERIALIZERS:
+        raise ValueError(f"Unknown DOM format: {dom_format}")
+    return DOM_SERIALIZERS[dom_format](dom)
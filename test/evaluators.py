@@ -12,10 +12,11 @@ from termcolor import colored
 
 from agentq.core.agent.eval_agent import EvalAgent
 from agentq.core.models.models import EvalAgentInput, EvalAgentOutput
-from agentq.core.skills.get_dom_with_content_type import get_dom_with_content_type
 from agentq.core.skills.get_screenshot import get_screenshot
-from agentq.core.skills.get_url import geturl
 from agentq.utils.logger import logger
+from test.dom_utils import prune_dom, rank_mmids, serialize_dom
+from test.observation_cache import get_observation_cache
+from test.screenshot_utils import ScreenshotPreprocessor, get_screenshot_preprocessor
 from test.test_utils import (
     clean_answer,
     evaluate_exact_match,
@@ -86,21 +87,26 @@ class StringEvaluator(Evaluator):
             elif approach == "fuzzy_match":
                 logger.info(f"Evaluating fuzzy_match for answer: {answer}")
                 intent = task_config["intent"]
-                if value == "N/A":
-                    score *= evaluate_exact_match(ref=value, pred=pred)
-                    if score != 1:
-                        score = 1.0 * evaluate_ua_match(
-                            intent=task_config["intent"],
-                            ref=task_config["eval"]["string_note"],
-                            pred=pred,
-                        )
-                else:
-                    logger.info(f"Evaluating generic for answer: {answer}")
-                    assert isinstance(value, List)
-                    for reference in value:
-                        score *= evaluate_fuzzy_match(
-                            ref=reference, pred=pred, intent=intent
-                        )
+                try:
+                    if value == "N/A":
+                        score *= evaluate_exact_match(ref=value, pred=pred)
+                        if score != 1:
+                            score = 1.0 * evaluate_ua_match(
+                                intent=task_config["intent"],
+                                ref=task_config["eval"]["string_note"],
+                                pred=pred,
+                            )
+                    else:
+                        logger.info(f"Evaluating generic for answer: {answer}")
+                        assert isinstance(value, List)
+                        for reference in value:
+                            score *= evaluate_fuzzy_match(
+                                ref=reference, pred=pred, intent=intent
+                            )
+                except ValueError as e:
+                    # an unparseable judge response fails this task instead of aborting the run
+                    logger.warning(f"Could not parse the LLM judge response: {e}")
+                    return {"score": 0.0, "reason": f"LLM judge response: {e}"}
             else:
                 logger.info(f"Unknown approach value received: {approach}")
         return {"score": score}
@@ -376,11 +382,25 @@ class ManualContentEvaluator(Evaluator):
 
 
 class LLMEvaluator(Evaluator):
-    """Evaluation Route for LLM Evaluation."""
+    """Evaluation Route for LLM Evaluation.
 
-    def __init__(self):
+    Attributes:
+        dom_token_budget (Optional[int]): If set, the page DOM is pruned to the elements most relevant to the task intent within this many tokens, counted in dom_format, before it is sent to the eval agent.
+        dom_format (str): How the DOM is rendered for the eval agent, "repr" (default) or "compact". See test.dom_utils.serialize_dom.
+        screenshot_preprocessor (Optional[ScreenshotPreprocessor]): If set, the screenshot is downscaled/cropped/re-encoded before it is sent to the eval agent.
+    """
+
+    def __init__(
+        self,
+        dom_token_budget: Optional[int] = None,
+        dom_format: str = "repr",
+        screenshot_preprocessor: Optional[ScreenshotPreprocessor] = None,
+    ):
         super().__init__()
         self.eval_agent = EvalAgent()
+        self.dom_token_budget = dom_token_budget
+        self.dom_format = dom_format
+        self.screenshot_preprocessor = screenshot_preprocessor
 
     async def __call__(
         self,
@@ -389,22 +409,45 @@ class LLMEvaluator(Evaluator):
         client: Optional[CDPSession] = None,
         answer: Optional[str] = None,
     ) -> Dict[str, Union[float, str]]:
+        observations = get_observation_cache(page)
+
         # Get current page URL and DOM content
-        current_url = await geturl(webpage=page)
-        dom_content = await get_dom_with_content_type(
-            content_type="all_fields", webpage=page
-        )
+        current_url = await observations.get_url()
+        dom_content = await observations.get_dom(content_type="all_fields")
+        if self.dom_token_budget:
+            dom_content = prune_dom(
+                dom_content,
+                task_config["intent"],
+                self.dom_token_budget,
+                dom_format=self.dom_format,
+            )
 
         # Prepare input for the eval agent
         eval_input = EvalAgentInput(
             objective=task_config["intent"],
             agent_output=answer,
             current_page_url=current_url,
-            current_page_dom=str(dom_content),
+            current_page_dom=serialize_dom(dom_content, self.dom_format),
         )
 
-        # Get screenshot
-        screenshot = await get_screenshot(webpage=page)
+        # Get screenshot, a full page preprocessor takes its own capture
+        screenshot = (
+            None
+            if self.screenshot_preprocessor and self.screenshot_preprocessor.full_page
+            else await get_screenshot(webpage=page)
+        )
+        if self.screenshot_preprocessor:
+            crop_mmids = (
+                rank_mmids(dom_content, task_config["intent"])
+                if self.screenshot_preprocessor.crop_to_relevant
+                else None
+            )
+            screenshot = await self.screenshot_preprocessor.capture(
+                page, screenshot, crop_mmids
+            )
+            logger.debug(
+                f"Screenshot cache stats: {self.screenshot_preprocessor.stats()}"
+            )
 
         # Call the eval agent
         eval_output: EvalAgentOutput = await self.eval_agent.run(eval_input, screenshot)
@@ -493,7 +536,18 @@ def evaluator_router(task_config: Dict[str, Any]) -> EvaluatorComb:
             evaluators.append(ManualContentEvaluator())
         elif eval_type == "llm_eval":
             logger.info("Adding LLM Evaluator")
-            evaluators.append(LLMEvaluator())
+            screenshot_options = task_config["eval"].get("screenshot_options")
+            evaluators.append(
+                LLMEvaluator(
+                    dom_token_budget=task_config["eval"].get("dom_token_budget"),
+                    dom_format=task_config["eval"].get("dom_format", "repr"),
+                    screenshot_preprocessor=(
+                        get_screenshot_preprocessor(screenshot_options)
+                        if screenshot_options
+                        else None
+                    ),
+                )
+            )
         else:
             raise ValueError(f"eval_type {eval_type} is not supported")
 
@@ -0,0 +1,215 @@
+"""Implements a shared LLM client with concurrency limits, jittered retries, hedged requests and latency stats."""
+
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Deque, Dict, List, Optional
+
+import httpx
+import openai
+from openai import OpenAI
+
+from agentq.utils.logger import logger
+from test.token_accounting import TokenAccountant
+
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+    openai.RateLimitError,
+)
+
+
+def _percentile(values: List[float], percentile: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class LLMGateway:
+    """A single OpenAI client shared by every caller, with global and per-model concurrency limits.
+
+    Failed calls are retried with exponential backoff and full jitter. With hedging enabled, a duplicate
+    request is sent once a call has been outstanding longer than the model's observed p95 latency, and the
+    first response wins. The losing request is not cancelled, it finishes in the background.
+
+    Attributes:
+        max_concurrency (int): Maximum number of requests in flight across all models.
+        max_concurrency_per_model (int): Maximum number of requests in flight per model.
+        max_retries (int): Number of retries after the first failed attempt.
+        backoff_base (float): Base delay in seconds for the exponential backoff.
+        hedge (bool): Whether to send hedged duplicate requests.
+        hedge_min_samples (int): Number of latency samples needed before a model is hedged.
+        latency_window (int): Number of recent latencies per model used for percentiles.
+        accountant (Optional[TokenAccountant]): If set, token usage and cost of every response (hedged duplicates included) are recorded in it.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 16,
+        max_concurrency_per_model: int = 8,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        hedge: bool = False,
+        hedge_min_samples: int = 20,
+        latency_window: int = 200,
+        accountant: Optional[TokenAccountant] = None,
+    ) -> None:
+        self.max_concurrency = max_concurrency
+        self.max_concurrency_per_model = max_concurrency_per_model
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.hedge = hedge
+        self.hedge_min_samples = hedge_min_samples
+        self.accountant = accountant
+
+        self._client: Optional[OpenAI] = None
+        self._client_lock = threading.Lock()
+        self._global_slots = threading.BoundedSemaphore(max_concurrency)
+        self._slots_per_model: Dict[str, threading.BoundedSemaphore] = {}
+        # hedging needs a second worker per request on top of the primary
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency * 2)
+        self._stats_lock = threading.Lock()
+        self._latencies: Dict[str, Deque[float]] = defaultdict(
+            lambda: deque(maxlen=latency_window)
+        )
+        self._counters: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {"requests": 0, "retries": 0, "hedges": 0, "hedge_wins": 0}
+        )
+
+    @property
+    def client(self) -> OpenAI:
+        with self._client_lock:
+            if self._client is None:
+                # the gateway does its own jittered retries, SDK retries would stack on top of them
+                self._client = OpenAI(
+                    max_retries=0,
+                    http_client=openai.DefaultHttpxClient(
+                        limits=httpx.Limits(
+                            max_connections=self.max_concurrency * 2,
+                            max_keepalive_connections=self.max_concurrency,
+                        )
+                    ),
+                )
+            return self._client
+
+    def _model_slots(self, model: str) -> threading.BoundedSemaphore:
+        with self._stats_lock:
+            if model not in self._slots_per_model:
+                self._slots_per_model[model] = threading.BoundedSemaphore(
+                    self.max_concurrency_per_model
+                )
+            return self._slots_per_model[model]
+
+    def chat_completion(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        agent: str = "default",
+        **kwargs: Any,
+    ) -> Any:
+        """Create a chat completion through the gateway.
+
+        Args:
+            model (str): The model name.
+            messages (List[Dict[str, str]]): The conversation messages.
+            agent (str, optional): The agent or judge making the call, used for token accounting. Defaults to "default".
+            **kwargs: Any other chat completion parameters.
+
+        Returns:
+            Any: The chat completion response.
+        """
+        with self._stats_lock:
+            self._counters[model]["requests"] += 1
+        primary = self._executor.submit(
+            self._call_with_retries, model, messages, agent, kwargs
+        )
+
+        hedge_delay = self._hedge_delay(model)
+        if hedge_delay is None:
+            return primary.result()
+        done, _ = wait([primary], timeout=hedge_delay)
+        if done:
+            return primary.result()
+
+        with self._stats_lock:
+            self._counters[model]["hedges"] += 1
+        logger.debug(f"Hedging {model} request after {hedge_delay:.2f}s")
+        hedged = self._executor.submit(
+            self._call_with_retries, model, messages, agent, kwargs
+        )
+        pending = {primary, hedged}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedged:
+                        with self._stats_lock:
+                            self._counters[model]["hedge_wins"] += 1
+                    return future.result()
+                error = future.exception()
+        raise error  # type: ignore
+
+    def _hedge_delay(self, model: str) -> Optional[float]:
+        if not self.hedge:
+            return None
+        with self._stats_lock:
+            latencies = list(self._latencies[model])
+        if len(latencies) < self.hedge_min_samples:
+            return None
+        return _percentile(latencies, 95)
+
+    def _call_with_retries(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        agent: str,
+        kwargs: Dict[str, Any],
+    ) -> Any:
+        for attempt in range(self.max_retries + 1):
+            try:
+                # take the model slot first, so requests queued on a busy model do not hold global capacity
+                with self._model_slots(model), self._global_slots:
+                    start = time.perf_counter()
+                    response = self.client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        **kwargs,  # type: ignore
+                    )
+                    latency = time.perf_counter() - start
+                with self._stats_lock:
+                    self._latencies[model].append(latency)
+                if self.accountant:
+                    self.accountant.record(agent, model, messages, response)
+                return response
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = random.uniform(0, self.backoff_base * 2**attempt)
+                logger.warning(
+                    f"{model} request failed ({e.__class__.__name__}), retrying in {delay:.2f}s"
+                )
+                with self._stats_lock:
+                    self._counters[model]["retries"] += 1
+                time.sleep(delay)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Get latency percentiles and request counters per model.
+
+        Returns:
+            Dict[str, Dict[str, float]]: For each model, "p50", "p95" and "p99" latency in seconds over the recent window, plus "requests", "retries", "hedges" and "hedge_wins".
+        """
+        with self._stats_lock:
+            stats: Dict[str, Dict[str, float]] = {}
+            for model, counters in self._counters.items():
+                latencies = list(self._latencies[model])
+                stats[model] = dict(counters)
+                if latencies:
+                    for percentile in (50, 95, 99):
+                        stats[model][f"p{percentile}"] = round(
+                            _percentile(latencies, percentile), 3
+                        )
+            return stats
@@ -0,0 +1,127 @@
+"""Implements routing of LLM calls to a cheap model first, escalating to the strong model on low confidence."""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Callable, Dict, Optional, TypeVar
+
+from agentq.utils.logger import logger
+
+T = TypeVar("T")
+
+
+class ModelRouter:
+    """Sends each call to a cheap model first and escalates to the strong model when the answer cannot be trusted.
+
+    A call is escalated when the cheap model's response fails the strict parse. The strong model's response,
+    which cannot be escalated further, may use a more lenient parse. A state (agent plus prompt) on which
+    the cheap model has already failed goes straight to the strong model on later calls. Every decision is
+    logged so the routing can be tuned.
+
+    Attributes:
+        cheap_model (Optional[str]): The model tried first. None disables routing and always uses the strong model.
+        max_failed_states (int): Maximum number of failed states remembered, the least recently used are forgotten first.
+    """
+
+    def __init__(
+        self, cheap_model: Optional[str] = None, max_failed_states: int = 1024
+    ) -> None:
+        self.cheap_model = cheap_model
+        self.max_failed_states = max_failed_states
+        self._lock = threading.Lock()
+        self._failed_states: "OrderedDict[str, None]" = OrderedDict()
+        self._counters: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {"cheap": 0, "strong": 0, "escalated": 0, "sticky_strong": 0}
+        )
+
+    def route(
+        self,
+        agent: str,
+        strong_model: str,
+        state: str,
+        generate: Callable[[str], str],
+        parse: Callable[[str], T],
+        fallback_parse: Optional[Callable[[str], T]] = None,
+    ) -> T:
+        """Generate and parse a response, trying the cheap model before the strong one.
+
+        Args:
+            agent (str): The agent or judge making the call.
+            strong_model (str): The model used when routing is disabled or the cheap model is not trusted.
+            state (str): Identifies the input, e.g. the prompt, so repeated failures on it can be remembered.
+            generate (Callable[[str], str]): Calls the LLM with the given model name and returns the response text.
+            parse (Callable[[str], T]): Turns a response into a result, raising ValueError if it cannot. Decides whether the cheap model's answer is trusted.
+            fallback_parse (Optional[Callable[[str], T]], optional): Parses the strong model's response instead of parse. Defaults to None (use parse).
+
+        Returns:
+            T: The parsed result.
+
+        Raises:
+            ValueError: If the strong model's response cannot be parsed either.
+        """
+        state_key = hashlib.sha256(f"{agent}\n{state}".encode()).hexdigest()
+        with self._lock:
+            failed_before = state_key in self._failed_states
+            if failed_before:
+                self._failed_states.move_to_end(state_key)
+
+        strong_reason = "failed before on this state" if failed_before else None
+        if self.cheap_model and not failed_before:
+            start = time.perf_counter()
+            response = generate(self.cheap_model)
+            try:
+                result = parse(response)
+            except ValueError as e:
+                with self._lock:
+                    self._failed_states[state_key] = None
+                    if len(self._failed_states) > self.max_failed_states:
+                        self._failed_states.popitem(last=False)
+                    self._counters[agent]["escalated"] += 1
+                self._log(agent, self.cheap_model, "escalate", start, reason=str(e))
+                strong_reason = f"escalated from {self.cheap_model}"
+            else:
+                with self._lock:
+                    self._counters[agent]["cheap"] += 1
+                self._log(agent, self.cheap_model, "accept", start)
+                return result
+
+        start = time.perf_counter()
+        with self._lock:
+            self._counters[agent]["strong"] += 1
+            if self.cheap_model and failed_before:
+                self._counters[agent]["sticky_strong"] += 1
+        result = (fallback_parse or parse)(generate(strong_model))
+        self._log(agent, strong_model, "accept", start, reason=strong_reason)
+        return result
+
+    def _log(
+        self,
+        agent: str,
+        model: str,
+        decision: str,
+        start: float,
+        reason: Optional[str] = None,
+    ) -> None:
+        logger.info(
+            "Model routing: "
+            + json.dumps(
+                {
+                    "agent": agent,
+                    "model": model,
+                    "decision": decision,
+                    "reason": reason,
+                    "latency": round(time.perf_counter() - start, 3),
+                }
+            )
+        )
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Get the routing counters per agent.
+
+        Returns:
+            Dict[str, Dict[str, int]]: For each agent, calls answered by the "cheap" and "strong" models, the number "escalated" after a cheap failure, and "sticky_strong" calls sent straight to the strong model.
+        """
+        with self._lock:
+            return {agent: dict(counters) for agent, counters in self._counters.items()}
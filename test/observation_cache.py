@@ -0,0 +1,150 @@
+"""Implements a per-page cache for DOM and URL observations shared by the evaluators."""
+
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from playwright.async_api import Frame, Page
+
+from agentq.core.skills.get_dom_with_content_type import get_dom_with_content_type
+from agentq.core.skills.get_url import geturl
+from agentq.utils.logger import logger
+
+# Installs a MutationObserver on first call and returns a counter that changes whenever the DOM does.
+# performance.timeOrigin identifies the document, so a reload of the same URL never reuses entries.
+PAGE_STATE_SCRIPT = """() => {
+    if (window.__agentq_dom_version === undefined) {
+        window.__agentq_dom_version = 0;
+        new MutationObserver(() => { window.__agentq_dom_version += 1; }).observe(
+            document, { subtree: true, childList: true, attributes: true, characterData: true }
+        );
+    }
+    return [performance.timeOrigin, window.__agentq_dom_version];
+}"""
+
+
+class PageObservationCache:
+    """Caches page observations so each one is extracted at most once per page state.
+
+    The page state is the current URL, the document and a DOM mutation counter maintained in the page.
+    Only the latest value of each kind of observation is kept. Entries are dropped when the main frame
+    navigates, and can be dropped explicitly with invalidate() after performing an action.
+
+    The first request for a kind of observation is passed straight through, without reading the page state
+    or installing the mutation observer, so a consumer that asks once per page state costs nothing. Caching
+    starts with the second request for the kind. Screenshots are not cached: scrolling, resizing, canvas,
+    video and CSS animations change the pixels without mutating the DOM.
+
+    Attributes:
+        hits (int): Number of observations served from the cache.
+        misses (int): Number of observations that had to be extracted.
+    """
+
+    def __init__(self, page: Page) -> None:
+        # a weak reference, so the cache kept in _caches does not keep its page key alive
+        self._page = weakref.ref(page)
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[str, Tuple[Tuple[Any, ...], Any]] = {}
+        self._requested: Set[str] = set()
+        page.on("framenavigated", self._on_frame_navigated)
+
+    @property
+    def page(self) -> Page:
+        """The Playwright page the observations are taken from."""
+        page = self._page()
+        if page is None:
+            raise ReferenceError("The page of this observation cache no longer exists")
+        return page
+
+    def _on_frame_navigated(self, frame: Frame) -> None:
+        if frame == self.page.main_frame:
+            self.invalidate()
+
+    def invalidate(self) -> None:
+        """Drop all cached observations for the page."""
+        self._entries.clear()
+
+    async def _page_state(self) -> Tuple[Any, ...]:
+        try:
+            time_origin, dom_version = await self.page.evaluate(PAGE_STATE_SCRIPT)
+        except Exception as e:
+            # the page is mid-navigation or closed, never serve a cached value for it
+            logger.debug(f"Could not read page state for observation cache: {e}")
+            self.invalidate()
+            return (self.page.url, None, None)
+        return (self.page.url, time_origin, dom_version)
+
+    async def _get(self, kind: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        if kind not in self._requested:
+            self._requested.add(kind)
+            self.misses += 1
+            return await loader()
+
+        if kind in self._entries:
+            state = await self._page_state()
+            entry = self._entries.get(kind)
+            if state[1] is not None and entry is not None and entry[0] == state:
+                self.hits += 1
+                return entry[1]
+
+        self.misses += 1
+        value = await loader()
+        # extraction tags elements with mmid attributes, which bumps the mutation counter,
+        # so the entry is stored under the state observed after loading
+        state = await self._page_state()
+        if state[1] is not None:
+            self._entries[kind] = (state, value)
+        return value
+
+    async def get_url(self) -> str:
+        return await self._get("url", lambda: geturl(webpage=self.page))
+
+    async def get_dom(self, content_type: str = "all_fields") -> Any:
+        return await self._get(
+            f"dom:{content_type}",
+            lambda: get_dom_with_content_type(
+                content_type=content_type, webpage=self.page
+            ),
+        )
+
+    def stats(self) -> Dict[str, int]:
+        """Get the hit/miss counters of the cache.
+
+        Returns:
+            Dict[str, int]: "hits", "misses" and the number of cached "entries".
+        """
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+_caches: "weakref.WeakKeyDictionary[Page, PageObservationCache]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_observation_cache(page: Page) -> PageObservationCache:
+    """Get the observation cache shared by every consumer of the given page, creating it if needed.
+
+    Args:
+        page (Page): The Playwright page.
+
+    Returns:
+        PageObservationCache: The cache for the page.
+    """
+    if page not in _caches:
+        _caches[page] = PageObservationCache(page)
+    return _caches[page]
+
+
+def get_observation_cache_stats(page: Page) -> Optional[Dict[str, int]]:
+    """Get the counters of the page's observation cache without creating one.
+
+    The counters accumulate over the lifetime of the page, across every task run on it.
+
+    Args:
+        page (Page): The Playwright page.
+
+    Returns:
+        Optional[Dict[str, int]]: The cache stats, or None if no consumer has used a cache for the page.
+    """
+    cache = _caches.get(page)
+    return cache.stats() if cache else None
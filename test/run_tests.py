@@ -51,6 +51,19 @@ if __name__ == "__main__":
         help='Path to the test configuration file. Default is "test/tasks/test.json" in the project root.',
     )
 
+    parser.add_argument(
+        "-tokens",
+        "--token_budget",
+        type=int,
+        help="Stop the run with partial results once the eval judge LLM calls (fuzzy and unachievable task matching) have used this many tokens. Calls made by the agents and the eval agent are not counted (default: no limit).",
+    )
+    parser.add_argument(
+        "-cost",
+        "--cost_budget",
+        type=float,
+        help="Stop the run with partial results once the eval judge LLM calls (fuzzy and unachievable task matching) have cost this many USD. Calls made by the agents and the eval agent are not counted (default: no limit).",
+    )
+
     # Parse the command line arguments
     args = parser.parse_args()
 
@@ -64,5 +77,7 @@ if __name__ == "__main__":
             test_results_id=args.test_results_id,
             wait_time_non_headless=args.wait_time_non_headless,
             take_screenshots=args.take_screenshots,
+            token_budget=args.token_budget,
+            cost_budget=args.cost_budget,
         )
     )
@@ -0,0 +1,231 @@
+"""Implements screenshot preprocessing to cut image size and tokens before screenshots are sent to a vision LLM."""
+
+import base64
+import hashlib
+import io
+import json
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from PIL import Image
+from playwright.async_api import Page
+
+from agentq.utils.logger import logger
+
+DATA_URL_PREFIX = "data:image/"
+
+# Returns the viewport relative [left, top, right, bottom] of the first `limit` rendered elements with one of
+# the mmids, skipping elements outside the viewport unless `fullPage`, plus the device pixel ratio and scroll
+# offsets, in a single round trip.
+ELEMENT_BOXES_SCRIPT = """([mmids, limit, fullPage]) => {
+    const boxes = [];
+    for (const mmid of mmids) {
+        if (boxes.length >= limit) break;
+        const element = document.querySelector(`[mmid="${CSS.escape(mmid)}"]`);
+        if (!element) continue;
+        const rect = element.getBoundingClientRect();
+        if (!rect.width && !rect.height) continue;
+        const visible = rect.right > 0 && rect.bottom > 0 && rect.left < window.innerWidth && rect.top < window.innerHeight;
+        if (fullPage || visible) boxes.push([rect.left, rect.top, rect.right, rect.bottom]);
+    }
+    return [boxes, window.devicePixelRatio, window.scrollX, window.scrollY];
+}"""
+
+
+def _decode_screenshot(screenshot: str) -> Tuple[bool, bytes]:
+    """Decode a base64 screenshot, with or without a data URL prefix.
+
+    Returns:
+        Tuple[bool, bytes]: Whether the input was a data URL, and the raw image bytes.
+    """
+    if screenshot.startswith(DATA_URL_PREFIX):
+        return True, base64.b64decode(screenshot.split(",", 1)[1])
+    return False, base64.b64decode(screenshot)
+
+
+def _encode_screenshot(image_bytes: bytes, mime_type: str, as_data_url: bool) -> str:
+    encoded = base64.b64encode(image_bytes).decode("utf-8")
+    return f"data:{mime_type};base64,{encoded}" if as_data_url else encoded
+
+
+class ScreenshotPreprocessor:
+    """Downscales, crops, converts and re-encodes screenshots, caching results by pixel hash.
+
+    The output has the same shape as the input (a data URL stays a data URL), so it can be passed wherever
+    a get_screenshot result is expected.
+
+    Attributes:
+        max_width (Optional[int]): Images wider than this are downscaled, keeping the aspect ratio.
+        max_height (Optional[int]): Images taller than this are downscaled, keeping the aspect ratio.
+        grayscale (bool): Convert images to grayscale.
+        jpeg_quality (Optional[int]): If set, images are re-encoded as JPEG with this quality instead of PNG.
+        full_page (bool): Capture the full scrollable page in capture() instead of using the viewport screenshot passed in.
+        crop_to_relevant (bool): Crop to the elements most relevant to the task, as ranked by the caller.
+        crop_top_n (int): Number of elements, taken in the order passed to capture(), that the crop is fitted to.
+        crop_padding (int): Padding in CSS pixels kept around the elements passed to capture() for cropping.
+        cache_size (int): Maximum number of processed images kept in the cache.
+        hits (int): Number of images served from the cache.
+        misses (int): Number of images that had to be processed.
+    """
+
+    def __init__(
+        self,
+        max_width: Optional[int] = None,
+        max_height: Optional[int] = None,
+        grayscale: bool = False,
+        jpeg_quality: Optional[int] = None,
+        full_page: bool = False,
+        crop_to_relevant: bool = False,
+        crop_top_n: int = 5,
+        crop_padding: int = 16,
+        cache_size: int = 64,
+    ) -> None:
+        self.max_width = max_width
+        self.max_height = max_height
+        self.grayscale = grayscale
+        self.jpeg_quality = jpeg_quality
+        self.full_page = full_page
+        self.crop_to_relevant = crop_to_relevant
+        self.crop_top_n = crop_top_n
+        self.crop_padding = crop_padding
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+
+    async def capture(
+        self,
+        page: Page,
+        screenshot: Optional[str] = None,
+        crop_mmids: Optional[List[str]] = None,
+    ) -> str:
+        """Preprocess a screenshot of the page, optionally capturing the full page and cropping to elements.
+
+        Args:
+            page (Page): The Playwright page the screenshot was taken from.
+            screenshot (Optional[str], optional): The viewport screenshot as returned by get_screenshot. Only optional with full_page, where it is only used for its encoding shape and callers should skip taking it. Defaults to None (a data URL).
+            crop_mmids (Optional[List[str]], optional): mmids of the elements to crop to, most relevant first. The crop covers the first crop_top_n that are rendered (and in the viewport, unless full_page). Defaults to None (no cropping).
+
+        Returns:
+            str: The processed screenshot, in the same encoding shape as the input.
+
+        Raises:
+            ValueError: If no screenshot is given and full_page is off.
+        """
+        if self.full_page:
+            as_data_url = _decode_screenshot(screenshot)[0] if screenshot else True
+            screenshot = _encode_screenshot(
+                await page.screenshot(full_page=True), "image/png", as_data_url
+            )
+        elif screenshot is None:
+            raise ValueError(
+                "A viewport screenshot is required unless full_page is set"
+            )
+        crop_box = await self._elements_box(page, crop_mmids) if crop_mmids else None
+        return self.process(screenshot, crop_box)
+
+    async def _elements_box(
+        self, page: Page, mmids: List[str]
+    ) -> Optional[Tuple[int, int, int, int]]:
+        """Get the union bounding box of the first crop_top_n visible elements, in screenshot pixels."""
+        try:
+            boxes, scale, scroll_x, scroll_y = await page.evaluate(
+                ELEMENT_BOXES_SCRIPT, [mmids, self.crop_top_n, self.full_page]
+            )
+        except Exception as e:
+            logger.debug(f"Could not get bounding boxes for mmids {mmids}: {e}")
+            return None
+        if not boxes:
+            return None
+
+        # bounding boxes are viewport relative, full page screenshots start at the document origin
+        offset_x, offset_y = (scroll_x, scroll_y) if self.full_page else (0, 0)
+        left = min(box[0] for box in boxes) + offset_x - self.crop_padding
+        top = min(box[1] for box in boxes) + offset_y - self.crop_padding
+        right = max(box[2] for box in boxes) + offset_x + self.crop_padding
+        bottom = max(box[3] for box in boxes) + offset_y + self.crop_padding
+        return (
+            int(max(left, 0) * scale),
+            int(max(top, 0) * scale),
+            int(right * scale),
+            int(bottom * scale),
+        )
+
+    def process(
+        self, screenshot: str, crop_box: Optional[Tuple[int, int, int, int]] = None
+    ) -> str:
+        """Apply cropping, downscaling, grayscale and re-encoding to a base64 screenshot.
+
+        Args:
+            screenshot (str): The screenshot as base64, with or without a data URL prefix.
+            crop_box (Optional[Tuple[int, int, int, int]], optional): (left, top, right, bottom) in image pixels. Defaults to None.
+
+        Returns:
+            str: The processed screenshot, in the same encoding shape as the input.
+        """
+        as_data_url, image_bytes = _decode_screenshot(screenshot)
+        image: Any = Image.open(io.BytesIO(image_bytes))
+        image.load()
+
+        pixel_hash = hashlib.sha256(image.tobytes())
+        pixel_hash.update(f"{image.mode}{image.size}{crop_box}{as_data_url}".encode())
+        cache_key = pixel_hash.hexdigest()
+        if cache_key in self._cache:
+            self.hits += 1
+            self._cache.move_to_end(cache_key)
+            return self._cache[cache_key]
+        self.misses += 1
+
+        if crop_box:
+            left, top, right, bottom = crop_box
+            right, bottom = min(right, image.width), min(bottom, image.height)
+            if left < right and top < bottom:
+                image = image.crop((left, top, right, bottom))
+        if self.max_width or self.max_height:
+            image.thumbnail(
+                (self.max_width or image.width, self.max_height or image.height)
+            )
+        if self.grayscale:
+            image = image.convert("L")
+
+        output = io.BytesIO()
+        if self.jpeg_quality:
+            if image.mode not in ("L", "RGB"):
+                image = image.convert("RGB")
+            image.save(output, format="JPEG", quality=self.jpeg_quality, optimize=True)
+            mime_type = "image/jpeg"
+        else:
+            image.save(output, format="PNG", optimize=True)
+            mime_type = "image/png"
+        processed = _encode_screenshot(output.getvalue(), mime_type, as_data_url)
+
+        self._cache[cache_key] = processed
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return processed
+
+    def stats(self) -> Dict[str, int]:
+        """Get the hit/miss counters of the processed image cache.
+
+        Returns:
+            Dict[str, int]: "hits", "misses" and the number of cached "entries".
+        """
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._cache)}
+
+
+_preprocessors: Dict[str, ScreenshotPreprocessor] = {}
+
+
+def get_screenshot_preprocessor(options: Dict[str, Any]) -> ScreenshotPreprocessor:
+    """Get the preprocessor shared by every evaluator using the same options, so its cache persists across tasks.
+
+    Args:
+        options (Dict[str, Any]): Keyword arguments for ScreenshotPreprocessor.
+
+    Returns:
+        ScreenshotPreprocessor: The shared preprocessor.
+    """
+    key = json.dumps(options, sort_keys=True)
+    if key not in _preprocessors:
+        _preprocessors[key] = ScreenshotPreprocessor(**options)
+    return _preprocessors[key]
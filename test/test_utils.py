@@ -8,17 +8,94 @@ from typing import Any, Dict, List, Optional, Union
 
 from dotenv import load_dotenv
 from nltk.tokenize import word_tokenize  # type: ignore
-from openai import OpenAI
+
+from test.llm_gateway import LLMGateway
+from test.model_router import ModelRouter
+from test.token_accounting import TokenAccountant
 
 load_dotenv()
-client = OpenAI()
+token_accountant = TokenAccountant()
+llm_gateway = LLMGateway(
+    hedge=os.environ.get("EVAL_LLM_HEDGE", "").lower() == "true",
+    accountant=token_accountant,
+)
+# set EVAL_JUDGE_CHEAP_MODEL (e.g. gpt-4o-mini) to try a cheaper judge before escalating to the strong one
+model_router = ModelRouter(cheap_model=os.environ.get("EVAL_JUDGE_CHEAP_MODEL"))
+
+
+def parse_final_label(response: str, labels: Dict[str, float]) -> float:
+    """Parse a judge response whose last non-empty line is one of the given labels.
+
+    The label may be prefixed (e.g. "Judgement: correct") and wrapped in quotes, markdown emphasis or a final
+    period, but must otherwise match exactly, so that e.g. "not correct" is never read as "correct".
+
+    Parameters:
+        response (str): The judge response.
+        labels (Dict[str, float]): The accepted lowercase labels and their scores.
+
+    Returns:
+        float: The score of the label.
+
+    Raises:
+        ValueError: If the last line is not one of the labels.
+    """
+    lines = [line for line in response.strip().splitlines() if line.strip()]
+    last_line = lines[-1] if lines else ""
+    label = last_line.split(":")[-1].strip(" *_'\"`.").lower()
+    if label not in labels:
+        raise ValueError(
+            f"Last line of the response is not one of {list(labels)}: {last_line}"
+        )
+    return labels[label]
+
+
+def parse_correctness(response: str) -> float:
+    """Leniently parse a correct/incorrect/partially correct judgement anywhere in the response.
+
+    Parameters:
+        response (str): The judge response.
+
+    Returns:
+        float: 0.0 if the response says incorrect, not correct or partially correct, 1.0 if it only says correct.
+
+    Raises:
+        ValueError: If the response contains no judgement.
+    """
+    response = response.lower()
+    if any(
+        label in response for label in ("partially correct", "incorrect", "not correct")
+    ):
+        return 0.0
+    if "correct" in response:
+        return 1.0
+    raise ValueError(f"No correct/incorrect judgement in response: {response}")
+
+
+def parse_sameness(response: str) -> float:
+    """Leniently parse a same/different judgement anywhere in the response.
+
+    Parameters:
+        response (str): The judge response.
+
+    Returns:
+        float: 0.0 if the response says different or not the same, 1.0 if it only says same.
+
+    Raises:
+        ValueError: If the response contains no judgement.
+    """
+    response = response.lower()
+    if "different" in response or "not the same" in response:
+        return 0.0
+    if "same" in response:
+        return 1.0
+    raise ValueError(f"No same/different judgement in response: {response}")
 
 
 def llm_fuzzy_match(pred: str, reference: str, question: str) -> float:
     """
     Evaluates if a predicted answer matches a reference answer semantically, considering the context of a question.
 
-    This function simulates a grading scenario, understanding that a student's answer may use different wording or phrasing from the reference answer. It uses GPT-4-turbo model to assess semantic equivalence.
+    This function simulates a grading scenario, understanding that a student's answer may use different wording or phrasing from the reference answer. It uses GPT-4-turbo model (or the cheaper EVAL_JUDGE_CHEAP_MODEL first, when set) to assess semantic equivalence.
 
     Parameters:
         pred (str): The student's predicted answer.
@@ -36,24 +113,32 @@ def llm_fuzzy_match(pred: str, reference: str, question: str) -> float:
     message += "all the string 'N/A' that you see is a special sequence that means 'not achievable'\n"
     message += f"student answer: {pred}\n"
     message += "Conclude the judgement by correct/incorrect/partially correct."
+    if model_router.cheap_model:
+        # the cheap model's answer is only trusted when the label can be parsed strictly
+        message += " Put the judgement alone on the last line."
     messages = [
         {"role": "system", "content": "You are a helpful assistant"},
         {"role": "user", "content": message},
     ]
 
-    response = generate_from_openai_chat_completion(
-        model="gpt-4-turbo-preview",
-        messages=messages,
-        temperature=0,
-        max_tokens=768,
-        top_p=1.0,
-        context_length=0,
-    ).lower()
-    if "partially correct" in response or "incorrect" in response:
-        return 0.0
-    else:
-        assert "correct" in response
-        return 1.0
+    return model_router.route(
+        agent="fuzzy_match_judge",
+        strong_model="gpt-4-turbo-preview",
+        state=message,
+        generate=lambda model: generate_from_openai_chat_completion(
+            model=model,
+            messages=messages,
+            temperature=0,
+            max_tokens=768,
+            top_p=1.0,
+            context_length=0,
+            agent="fuzzy_match_judge",
+        ),
+        parse=lambda response: parse_final_label(
+            response, {"correct": 1.0, "incorrect": 0.0, "partially correct": 0.0}
+        ),
+        fallback_parse=parse_correctness,
+    )
 
 
 def llm_ua_match(pred: str, reference: str, question: str) -> float:
@@ -61,7 +146,7 @@ def llm_ua_match(pred: str, reference: str, question: str) -> float:
     Evaluates the alignment between a reported reason for a task being unachievable and the actual reason.
 
     This function reviews both the actual and reported reasons for a task's unachievability within the context of the task.
-    It assesses if the reported reason is implicitly or explicitly in line with the actual reason, using GPT-turbo model.
+    It assesses if the reported reason is implicitly or explicitly in line with the actual reason, using GPT-turbo model (or the cheaper EVAL_JUDGE_CHEAP_MODEL first, when set).
 
     Parameters:
         pred (str): The reported unachievable reason by an individual.
@@ -84,24 +169,32 @@ def llm_ua_match(pred: str, reference: str, question: str) -> float:
         "Determine if the reported reason aligns with the actual reason, even if implicitly. "
         "If the stated reason is in line with the actual reason, respond with 'same'. Otherwise, respond with 'different'."
     )
+    if model_router.cheap_model:
+        # the cheap model's answer is only trusted when the label can be parsed strictly
+        message += " Put this answer alone on the last line."
     messages = [
         {"role": "system", "content": "You are a helpful assistant"},
         {"role": "user", "content": message},
     ]
 
-    response = generate_from_openai_chat_completion(
-        model="gpt-4-turbo-preview",
-        messages=messages,
-        temperature=0,
-        max_tokens=768,
-        top_p=1.0,
-        context_length=0,
-    ).lower()
-    if "different" in response:
-        return 0.0
-    else:
-        assert "same" in response
-        return 1.0
+    return model_router.route(
+        agent="ua_match_judge",
+        strong_model="gpt-4-turbo-preview",
+        state=message,
+        generate=lambda model: generate_from_openai_chat_completion(
+            model=model,
+            messages=messages,
+            temperature=0,
+            max_tokens=768,
+            top_p=1.0,
+            context_length=0,
+            agent="ua_match_judge",
+        ),
+        parse=lambda response: parse_final_label(
+            response, {"same": 1.0, "different": 0.0}
+        ),
+        fallback_parse=parse_sameness,
+    )
 
 
 def generate_from_openai_chat_completion(
@@ -112,11 +205,12 @@ def generate_from_openai_chat_completion(
     top_p: float,
     context_length: int,
     stop_token: Optional[str] = None,
+    agent: str = "eval_judge",
 ) -> str:
     """
     Generates a response from OpenAI's chat completions based on a conversation constructed from a List of messages.
 
-    This function makes a call to the OpenAI API using specified parameters to control the generation.
+    This function makes a call to the OpenAI API through the shared LLM gateway using specified parameters to control the generation.
     It requires an API key to be set in the environment variables.
 
     Parameters:
@@ -127,6 +221,7 @@ def generate_from_openai_chat_completion(
         top_p (float): Nucleus sampling parameter controlling the size of the probability mass to sample from.
         context_length (int): The maximum number of tokens from `messages` to use for context.
         stop_token (str, optional): A token at which to stop generating further tokens.
+        agent (str, optional): The judge making the call, used for token accounting. Default is "eval_judge".
 
     Returns:
         str: The generated response as a string.
@@ -138,12 +233,13 @@ def generate_from_openai_chat_completion(
         raise ValueError(
             "OPENAI_API_KEY environment variable must be set when using OpenAI API."
         )
-    client.api_key = os.environ["OPENAI_API_KEY"]
-    client.organization = os.environ.get("OPENAI_ORGANIZATION", "")
+    llm_gateway.client.api_key = os.environ["OPENAI_API_KEY"]
+    llm_gateway.client.organization = os.environ.get("OPENAI_ORGANIZATION", "")
 
-    response = client.chat.completions.create(
+    response = llm_gateway.chat_completion(
         model=model,
         messages=messages,  # type: ignore
+        agent=agent,
         temperature=temperature,
         max_tokens=max_tokens,
         top_p=top_p,
@@ -18,10 +18,14 @@ from agentq.core.models.models import State
 from agentq.core.orchestrator.orchestrator import Orchestrator
 from agentq.utils.logger import logger
 from test.evaluators import evaluator_router
+from test.observation_cache import get_observation_cache_stats
 from test.test_utils import (
     get_formatted_current_timestamp,
+    llm_gateway,
     load_config,
+    model_router,
     task_config_validator,
+    token_accountant,
 )
 
 TEST_TASKS = os.path.join(PROJECT_TEST_ROOT, "tasks")
@@ -88,6 +92,13 @@ def save_test_results(test_results: List[Dict[str, Any]], test_results_id: str):
     logger.info(f"Test results dumped to: {file_name}")
 
 
+def save_token_usage(token_usage: Dict[str, Any], results_dir: str):
+    file_name = os.path.join(results_dir, "token_usage.json")
+    with open(file_name, "w", encoding="utf-8") as f:
+        json.dump(token_usage, f, ensure_ascii=False, indent=4)
+    logger.info(f"Token usage dumped to: {file_name}")
+
+
 def save_individual_test_result(test_result: Dict[str, Any], results_dir: str):
     task_id = test_result["task_id"]
     file_name = os.path.join(results_dir, f"test_result_{task_id}.json")
@@ -139,6 +150,7 @@ async def execute_single_task(
     task_index = task_config.get("task_index")
     start_url = task_config.get("start_url")
     logger.info(f"Intent: {command}, Task ID: {task_id}")
+    token_accountant.start_step(str(task_id))
 
     if start_url:
         await page.goto(start_url, wait_until="load", timeout=30000)
@@ -180,6 +192,13 @@ async def execute_single_task(
 
     single_task_result["score"] = evaluator_result["score"]
     single_task_result["reason"] = evaluator_result["reason"]
+    single_task_result["token_usage"] = token_accountant.step_summary(str(task_id))
+
+    observation_cache_stats = get_observation_cache_stats(page)
+    if observation_cache_stats:
+        logger.info(
+            f"Page observation cache stats after task {task_id} (cumulative for the page): {observation_cache_stats}"
+        )
 
     return single_task_result
 
@@ -192,8 +211,11 @@ async def run_tests(
     test_results_id: str = "",
     wait_time_non_headless: int = 5,
     take_screenshots: bool = True,
+    token_budget: Optional[int] = None,
+    cost_budget: Optional[float] = None,
 ) -> List[Dict[str, Any]]:
     check_top_level_test_folders()
+    token_accountant.reset(max_tokens=token_budget, max_cost=cost_budget)
 
     if not test_file:
         test_file = os.path.join(
@@ -211,10 +233,18 @@ async def run_tests(
     test_results = []
     max_task_index = len(test_configurations) if not max_task_index else max_task_index
     total_tests = max_task_index - min_task_index
+    budget_exhausted = False
 
     for index, task_config in enumerate(
         test_configurations[min_task_index:max_task_index], start=min_task_index
     ):
+        if token_accountant.budget_exceeded():
+            logger.warning(
+                f"Eval judge token/cost budget exhausted after {len(test_results)} of {total_tests} tasks, stopping the run with partial results."
+            )
+            budget_exhausted = True
+            break
+
         task_id = str(task_config.get("task_id"))
         log_folders = create_task_log_folders(task_id, test_results_id)
 
@@ -238,8 +268,14 @@ async def run_tests(
         await orchestrator.playwright_manager.take_screenshots("final", None)
         await orchestrator.playwright_manager.close_except_specified_tab(page)
 
-    print_progress_bar(total_tests, total_tests)
-    print("\n\nAll tests completed.")
+    if budget_exhausted:
+        print_progress_bar(len(test_results), total_tests)
+        print(
+            f"\n\nEval judge token/cost budget exhausted, stopped after {len(test_results)} of {total_tests} tests."
+        )
+    else:
+        print_progress_bar(total_tests, total_tests)
+        print("\n\nAll tests completed.")
 
     print("\nDetailed Test Results:")
     detailed_results_table = [
@@ -273,17 +309,29 @@ async def run_tests(
             "Total Time Taken (s)",
         ],
         [
-            total_tests,
+            len(test_results),
             len(passed_tests),
             len(failed_tests),
             len(skipped_tests),
-            round(sum(test["tct"] for test in test_results) / total_tests, 2),
+            round(
+                sum(test["tct"] for test in test_results) / max(len(test_results), 1),
+                2,
+            ),
             round(sum(test["tct"] for test in test_results), 2),
         ],
     ]
 
     print("\nSummary Report:")
     print(tabulate(summary_table, headers="firstrow", tablefmt="grid"))
+    logger.info(f"LLM gateway latency stats: {llm_gateway.stats()}")
+    logger.info(f"Judge model routing stats: {model_router.stats()}")
+    token_usage = token_accountant.summary()
+    # only calls made through llm_gateway are accounted, the agents and the eval agent use their own clients
+    token_usage["scope"] = "eval judge calls only"
+    logger.info(
+        f"Eval judge token usage for the run (agent calls not counted): {token_usage['run']}"
+    )
+    save_token_usage(token_usage, results_dir)
 
     return test_results
 
@@ -0,0 +1,154 @@
+"""Implements per-call token and cost accounting with per-agent, per-step and per-run rollups and run budgets."""
+
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import tiktoken
+
+from agentq.utils.logger import logger
+
+# USD per 1M (prompt, completion) tokens
+MODEL_PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-4-turbo-preview": (10.0, 30.0),
+    "gpt-4-turbo": (10.0, 30.0),
+    "gpt-4o": (5.0, 15.0),
+    "gpt-4o-mini": (0.15, 0.6),
+    "gpt-3.5-turbo": (0.5, 1.5),
+}
+
+
+def _empty_usage() -> Dict[str, float]:
+    return {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost": 0.0}
+
+
+def estimate_tokens(model: str, text: str) -> int:
+    """Estimate the number of tokens in a text with tiktoken.
+
+    Args:
+        model (str): The model name, used to pick the encoding. Unknown models use cl100k_base.
+        text (str): The text to measure.
+
+    Returns:
+        int: The estimated number of tokens.
+    """
+    try:
+        encoding = tiktoken.encoding_for_model(model)
+    except KeyError:
+        encoding = tiktoken.get_encoding("cl100k_base")
+    return len(encoding.encode(text))
+
+
+class TokenAccountant:
+    """Records token usage and cost of LLM calls and rolls them up per agent, per step and per run.
+
+    Attributes:
+        max_tokens (Optional[int]): Token budget for the run. None means no limit.
+        max_cost (Optional[float]): Cost budget in USD for the run. None means no limit.
+        current_step (str): The step that new calls are attributed to.
+    """
+
+    def __init__(
+        self, max_tokens: Optional[int] = None, max_cost: Optional[float] = None
+    ) -> None:
+        self._lock = threading.Lock()
+        self.reset(max_tokens, max_cost)
+
+    def reset(
+        self, max_tokens: Optional[int] = None, max_cost: Optional[float] = None
+    ) -> None:
+        """Clear all recorded usage and set the budgets for a new run."""
+        with self._lock:
+            self.max_tokens = max_tokens
+            self.max_cost = max_cost
+            self.current_step = "default"
+            self._run = _empty_usage()
+            self._per_agent: Dict[str, Dict[str, float]] = defaultdict(_empty_usage)
+            self._per_step: Dict[str, Dict[str, float]] = defaultdict(_empty_usage)
+            self._unpriced_models: set = set()
+
+    def start_step(self, step: str) -> None:
+        """Attribute subsequent calls to the given step, e.g. a task id."""
+        with self._lock:
+            self.current_step = step
+
+    def record(
+        self,
+        agent: str,
+        model: str,
+        messages: List[Dict[str, Any]],
+        response: Any,
+    ) -> None:
+        """Record a chat completion, using the provider usage fields when available and tiktoken estimates otherwise.
+
+        Args:
+            agent (str): The agent or judge that made the call.
+            model (str): The model name.
+            messages (List[Dict[str, Any]]): The messages sent.
+            response (Any): The chat completion response.
+        """
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            prompt_tokens = usage.prompt_tokens
+            completion_tokens = usage.completion_tokens
+        else:
+            prompt_tokens = estimate_tokens(
+                model, "\n".join(str(m.get("content", "")) for m in messages)
+            )
+            completion_tokens = estimate_tokens(
+                model, response.choices[0].message.content or ""
+            )
+
+        prompt_price, completion_price = MODEL_PRICES.get(model, (0.0, 0.0))
+        cost = (
+            prompt_tokens * prompt_price + completion_tokens * completion_price
+        ) / 1_000_000
+
+        with self._lock:
+            if model not in MODEL_PRICES and model not in self._unpriced_models:
+                self._unpriced_models.add(model)
+                logger.warning(f"No price known for model {model}, cost counted as 0")
+            for totals in (
+                self._run,
+                self._per_agent[agent],
+                self._per_step[self.current_step],
+            ):
+                totals["calls"] += 1
+                totals["prompt_tokens"] += prompt_tokens
+                totals["completion_tokens"] += completion_tokens
+                totals["cost"] += cost
+
+    def budget_exceeded(self) -> bool:
+        """Check whether the run has used up its token or cost budget.
+
+        Returns:
+            bool: True if either budget is set and has been reached.
+        """
+        with self._lock:
+            total_tokens = self._run["prompt_tokens"] + self._run["completion_tokens"]
+            return (
+                self.max_tokens is not None and total_tokens >= self.max_tokens
+            ) or (self.max_cost is not None and self._run["cost"] >= self.max_cost)
+
+    def step_summary(self, step: str) -> Dict[str, float]:
+        """Get the usage of a single step.
+
+        Returns:
+            Dict[str, float]: "calls", "prompt_tokens", "completion_tokens" and "cost".
+        """
+        with self._lock:
+            return dict(self._per_step.get(step, _empty_usage()))
+
+    def summary(self) -> Dict[str, Any]:
+        """Get the usage of the run, with per-agent and per-step rollups.
+
+        Returns:
+            Dict[str, Any]: "run", "per_agent" and "per_step" usage, plus the configured "budget".
+        """
+        with self._lock:
+            return {
+                "run": dict(self._run),
+                "per_agent": {k: dict(v) for k, v in self._per_agent.items()},
+                "per_step": {k: dict(v) for k, v in self._per_step.items()},
+                "budget": {"max_tokens": self.max_tokens, "max_cost": self.max_cost},
+            }